@@ -11,22 +11,40 @@ Expect these env vars for cloud run:
   SERVICE_ACCOUNT_FILE (path to serviceAcc.json) or place file in same dir
   QDRANT_URL
   QDRANT_API_KEY
+  QDRANT_PREFER_GRPC (optional) - "1" (default) upserts over gRPC on QDRANT_GRPC_PORT (6334)
   COLLECTION_NAME (optional, default: pixeltrace_faces)
+  MANIFEST_DB (optional) - SQLite file of already indexed files (default indexed.db, "" disables);
+                           delete it when the collection is dropped or recreated
   MODEL_DIR (optional)
   MAX_DIM (optional)
   PROVIDER_CTX (optional) - set to -1 for CPU, 0 for first GPU
+  DUP_THRESHOLD (optional) - mean abs diff of 32x32 thumbnails under which a frame reuses
+                             the previous frame's faces (default 2.0, 0 disables)
+  FP16 (optional) - "1" (default) runs detection/recognition in FP16 on CUDA, "0" keeps FP32
+  QUANTIZATION (optional) - "int8" (default), "binary" or "none"; applied when creating the collection
+  SIGN_BITS (optional) - "1" adds each embedding's packed sign bits (base64) as payload "bin"
+                         for Hamming scans outside Qdrant (default "0")
+  PIXELTRACE_DEBUG (optional) - set to list the model dir and dump this file at startup
 """
 
 import os
 import sys
 import time
 import io
+import base64
+import mmap
 import json
 import argparse
+import sqlite3
 import traceback
 import uuid
+import hashlib
 import threading
+import queue
+import multiprocessing
 import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque, OrderedDict
 from pathlib import Path
 
 import numpy as np
@@ -38,9 +56,15 @@ from PIL import Image
 import rawpy
 import pyheif
 import requests
+try:
+    # libjpeg-turbo with DCT-domain downscaling; falls back to cv2.imdecode
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except ImportError:
+    TurboJPEG = None
 
 # google drive
 from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession
 from googleapiclient.discovery import build
 
 # insightface & onnx/ort
@@ -48,19 +72,66 @@ FaceAnalysis = None
 
 # qdrant
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance
-
-os.system("ls -R /app/.insightface/models")
+from qdrant_client.http.models import (
+    PointStruct,
+    VectorParams,
+    Distance,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+)
+
+if os.getenv("PIXELTRACE_DEBUG"):
+    os.system("ls -R /app/.insightface/models")
 
 # ---------------- configuration defaults ----------------
 MAX_DIM = int(os.getenv("MAX_DIM", "800"))
 SERVICE_ACCOUNT_FILE = os.getenv("SERVICE_ACCOUNT_FILE", "serviceAcc.json")
 QDRANT_URL = os.getenv("QDRANT_URL", None)
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", None)
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "1") == "1"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "pixeltrace_faces")
+MANIFEST_DB = os.getenv("MANIFEST_DB", "indexed.db")
 MODEL_DIR = os.getenv("MODEL_DIR", "models/antelope")
 CTX_ID = int(os.getenv("PROVIDER_CTX", "0"))  # use -1 for CPU
-_MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))
+_MAX_WORKERS = int(os.getenv("MAX_WORKERS", "16"))                       # download threads
+_DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", str(os.cpu_count() or 4)))  # decode processes
+_BATCH_SIZE = int(os.getenv("BATCH_SIZE", "16"))          # images per detector run
+_REC_BATCH_SIZE = int(os.getenv("REC_BATCH_SIZE", "64"))  # aligned crops per recognizer run
+_DET_SIZE = 640
+_RAW_EXTS = ('.nef', '.cr2', '.arw', '.raf')
+_QUEUE_SIZE = 32  # bound on every inter-stage queue (backpressure)
+_FP16 = os.getenv("FP16", "1") == "1"
+_SIGN_BITS = os.getenv("SIGN_BITS", "0") == "1"
+_DUP_THRESHOLD = float(os.getenv("DUP_THRESHOLD", "2.0"))
+_DUP_CACHE_SIZE = 256
+_DUP_RECENT = 8
+_UPSERT_BATCH = 256       # points per qdrant.upsert
+_UPSERT_INTERVAL = 1.0    # seconds before a partial batch is sent anyway
+_DRIVE_LIST_WORKERS = 8
+_DRIVE_PARENTS_PER_QUERY = 50
+QUANTIZATION = os.getenv("QUANTIZATION", "int8").lower()
+
+# per-thread Drive clients (httplib2 is not thread-safe)
+_thread_local = threading.local()
+
+# near-duplicate frame cache: thumbnail hash -> (dets, embs)
+_dup_lock = threading.Lock()
+_dup_cache = OrderedDict()
+_dup_recent = deque(maxlen=_DUP_RECENT)  # (shape, thumb, key) of the last few frames
+
+# points waiting to be upserted, shared across files, and the manifest rows of
+# those files; both leave the buffer together so a row is only written once
+# its points were upserted
+_point_lock = threading.Lock()
+_point_buffer = deque()
+_manifest_rows = []
+_last_flush = time.monotonic()
+
+_manifest_lock = threading.Lock()
 
 # threading lock for collection creation
 _collection_lock = threading.Lock()
@@ -70,8 +141,12 @@ _collection_dim = None
 # ---------------- clients (initialized later) ----------------
 drive_service = None
 drive_creds = None
+drive_session = None
 app = None
 qdrant = None
+decode_pool = None
+manifest_db = None
+_turbojpeg = None  # per decode process; False once libturbojpeg failed to load
 
 # ---------------- helpers ----------------
 def ensure_qdrant_client():
@@ -80,7 +155,33 @@ def ensure_qdrant_client():
         return
     if not QDRANT_URL:
         raise SystemExit("QDRANT_URL env var must be set")
-    qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    if QUANTIZATION not in ("int8", "binary", "none"):
+        raise SystemExit(f"QUANTIZATION must be int8, binary or none, got {QUANTIZATION!r}")
+    # gRPC carries vectors as packed floats instead of JSON decimal strings
+    qdrant = QdrantClient(
+        url=QDRANT_URL,
+        api_key=QDRANT_API_KEY,
+        prefer_grpc=QDRANT_PREFER_GRPC,
+        grpc_port=QDRANT_GRPC_PORT,
+    )
+
+def quantization_config():
+    """
+    Server-side quantization for new collections. Vectors are still upserted
+    as float32 (kept for rescoring); Qdrant builds the quantized copy and
+    keeps it in RAM, so scans use 1 byte per dimension ("int8") or 1 bit per
+    dimension ("binary", search with oversampling + rescore). "none" keeps
+    float32 only; ensure_qdrant_client rejects anything else.
+    """
+    if QUANTIZATION == "int8":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+        )
+    if QUANTIZATION == "binary":
+        return BinaryQuantization(
+            binary=BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
 
 # add near other helpers (ensure_qdrant_client etc.)
 def ensure_collection(dim):
@@ -104,6 +205,7 @@ def ensure_collection(dim):
             qdrant.create_collection(
                 collection_name=COLLECTION_NAME,
                 vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+                quantization_config=quantization_config(),
             )
             _collection_created = True
             _collection_dim = dim
@@ -156,22 +258,63 @@ def ensure_insightface():
     ]
   
 
+    # only detection + recognition are used; skip loading landmark/genderage models
     app = FaceAnalysis(
         name="antelopev2",
         root=ROOT_DIR,        # CRITICAL: must point to .insightface
+        allowed_modules=["detection", "recognition"],
         providers=providers
     )
     import onnxruntime as ort
     print("ORT Providers:", ort.get_available_providers())
 
-    app.prepare(ctx_id=0 if "CUDAExecutionProvider" in providers else -1,det_size=(640, 640))
+    app.prepare(ctx_id=0 if "CUDAExecutionProvider" in providers else -1,det_size=(_DET_SIZE, _DET_SIZE))
 
+    if _FP16 and "CUDAExecutionProvider" in ort.get_available_providers():
+        use_fp16_sessions()
 
     print("Loaded models:", list(app.models.keys()))
     print("Antelopev2 initialized successfully!")
 
+def _fp16_model_path(model_file):
+    """Convert an ONNX model to FP16 once and cache it under <model dir>/fp16/."""
+    out_dir = os.path.join(os.path.dirname(model_file), "fp16")  # not globbed by FaceAnalysis
+    out_path = os.path.join(out_dir, os.path.basename(model_file))
+    if not os.path.exists(out_path):
+        import onnx
+        from onnxconverter_common import float16
+
+        print(f"Converting {model_file} to FP16...")
+        os.makedirs(out_dir, exist_ok=True)
+        # keep_io_types: inputs/outputs stay float32, so InsightFace's blobs work unchanged
+        model = float16.convert_float_to_float16_model_path(model_file, keep_io_types=True)
+        onnx.save(model, out_path + ".tmp")
+        os.replace(out_path + ".tmp", out_path)
+    return out_path
+
+
+def use_fp16_sessions():
+    """
+    Swap the detector and recognizer sessions for FP16 ones (Tensor Cores,
+    half the memory traffic). Input/output names are unchanged by the
+    conversion, so the InsightFace wrappers keep working. Embeddings are
+    still L2-normalized in float32.
+    """
+    import onnxruntime as ort
+
+    providers = [
+        ("CUDAExecutionProvider", {"cudnn_conv_algo_search": "HEURISTIC", "do_copy_in_default_stream": True}),
+        "CPUExecutionProvider"
+    ]
+    for model in (app.det_model, app.models["recognition"]):
+        try:
+            model.session = ort.InferenceSession(_fp16_model_path(model.model_file), providers=providers)
+            print(f"Using FP16 session for {model.taskname}")
+        except Exception as e:
+            print(f"FP16 conversion failed for {model.model_file}, keeping FP32: {e}")
+
 def ensure_drive_service():
-    global drive_service, drive_creds
+    global drive_service, drive_creds, drive_session
 
     if drive_service is not None:
         return
@@ -186,10 +329,144 @@ def ensure_drive_service():
 
     drive_service = build("drive", "v3", credentials=drive_creds)
 
+    # keep-alive session for media downloads; refreshes the SA token when it expires
+    drive_session = AuthorizedSession(drive_creds)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=32)
+    drive_session.mount("https://", adapter)
+
     print("Initialized Google Drive service")
 
 
-def decode_image_from_bytes(content_bytes, file_name):
+def ensure_manifest_db():
+    """
+    Rows are keyed by owner, event and COLLECTION_NAME. The manifest can't see
+    what happens to the collection itself: after dropping or recreating it,
+    delete MANIFEST_DB too or every file will be skipped.
+    """
+    global manifest_db
+    if manifest_db is not None or not MANIFEST_DB:
+        return
+    manifest_db = sqlite3.connect(MANIFEST_DB, check_same_thread=False)
+    manifest_db.execute(
+        "CREATE TABLE IF NOT EXISTS indexed ("
+        "collection TEXT, owner_id TEXT, event_id TEXT, file_id TEXT, mtime TEXT, n_faces INTEGER, "
+        "PRIMARY KEY (collection, owner_id, event_id, file_id))"
+    )
+    manifest_db.commit()
+
+
+def filter_unchanged(files, owner_id, event_id):
+    """Drop files already indexed into COLLECTION_NAME for this owner and event at the same modifiedTime."""
+    if manifest_db is None:
+        return files
+    with _manifest_lock:
+        seen = dict(manifest_db.execute(
+            "SELECT file_id, mtime FROM indexed WHERE collection=? AND owner_id=? AND event_id=?",
+            (COLLECTION_NAME, owner_id, event_id),
+        ))
+    return [f for f in files if f.get('modifiedTime') is None or seen.get(f['id']) != f['modifiedTime']]
+
+
+def _manifest_row(file, owner_id, event_id, n_faces):
+    if manifest_db is None or file.get('modifiedTime') is None:
+        return None
+    return (COLLECTION_NAME, owner_id, event_id, file['id'], file['modifiedTime'], n_faces)
+
+
+def record_indexed(file, owner_id, event_id, n_faces):
+    """Queue the manifest row of a file without points; written by the next flush_points."""
+    row = _manifest_row(file, owner_id, event_id, n_faces)
+    if row is not None:
+        with _point_lock:
+            _manifest_rows.append(row)
+
+
+def write_manifest(rows):
+    if manifest_db is None or not rows:
+        return
+    with _manifest_lock:
+        manifest_db.executemany("INSERT OR REPLACE INTO indexed VALUES (?, ?, ?, ?, ?, ?)", rows)
+        manifest_db.commit()
+
+
+def ensure_decode_pool():
+    """
+    Process pool for image decoding. rawpy/pyheif hold the GIL, so threads
+    serialize on them; separate processes decode truly in parallel.
+    spawn (not fork) because the parent already has CUDA/ORT threads running.
+    A pool broken by a dead worker (e.g. OOM-killed) is replaced.
+    """
+    global decode_pool
+    if decode_pool is not None:
+        if not getattr(decode_pool, "_broken", False):
+            return
+        print("Decode pool is broken (a worker process died), restarting it")
+        decode_pool.shutdown(wait=False, cancel_futures=True)
+        decode_pool = None
+    decode_pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=_DECODE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    print(f"Started decode pool with {_DECODE_WORKERS} processes")
+
+
+# EXIF orientation -> transform, matching what cv2.imdecode(IMREAD_COLOR) applies
+_EXIF_TRANSFORMS = {
+    2: lambda img: cv2.flip(img, 1),
+    3: lambda img: cv2.rotate(img, cv2.ROTATE_180),
+    4: lambda img: cv2.flip(img, 0),
+    5: lambda img: cv2.transpose(img),
+    6: lambda img: cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda img: cv2.rotate(cv2.transpose(img), cv2.ROTATE_180),
+    8: lambda img: cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+
+
+def _get_turbojpeg():
+    global _turbojpeg
+    if _turbojpeg is None:
+        _turbojpeg = False
+        if TurboJPEG is not None:
+            try:
+                _turbojpeg = TurboJPEG()
+            except Exception as e:
+                print(f"TurboJPEG unavailable, using cv2.imdecode: {e}")
+    return _turbojpeg
+
+
+def decode_jpeg_scaled(content_bytes, max_dim):
+    """
+    Decode a JPEG with libjpeg-turbo, downscaling in the IDCT by the largest
+    supported factor that keeps the long side >= max_dim. Returns BGR or None
+    when TurboJPEG isn't available.
+    """
+    jpeg = _get_turbojpeg()
+    if not jpeg:
+        return None
+
+    width, height, _, _ = jpeg.decode_header(content_bytes)
+    long_side = max(width, height)
+    scaling_factor = None
+    if max_dim:
+        for num, denom in sorted(jpeg.scaling_factors, key=lambda f: f[0] / f[1]):
+            if num <= denom and -(-long_side * num // denom) >= max_dim:
+                scaling_factor = (num, denom)
+                break
+    img = jpeg.decode(content_bytes, pixel_format=TJPF_BGR, scaling_factor=scaling_factor)
+
+    # TurboJPEG ignores EXIF; rotate like cv2.imdecode would
+    try:
+        # an mmap is already file-like; BytesIO over it would copy the file
+        fp = content_bytes if isinstance(content_bytes, mmap.mmap) else io.BytesIO(content_bytes)
+        with Image.open(fp) as im:
+            orientation = im.getexif().get(0x0112, 1)
+    except Exception:
+        orientation = 1
+    transform = _EXIF_TRANSFORMS.get(orientation)
+    return transform(img) if transform else img
+
+
+def decode_image_from_bytes(content_bytes, file_name, max_dim=None):
     lower = file_name.lower()
     try:
         if lower.endswith(".heic") or lower.endswith(".heif"):
@@ -204,154 +481,185 @@ def decode_image_from_bytes(content_bytes, file_name):
             )
             return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
 
-        if lower.endswith(('.nef', '.cr2', '.arw', '.raf')):
-            with rawpy.imread(io.BytesIO(content_bytes)) as raw:
+        if lower.endswith(_RAW_EXTS):
+            # rawpy reads file objects whole: BytesIO(bytes) shares the buffer, an mmap
+            # is read once; a path (str) lets LibRaw open the file itself
+            source = io.BytesIO(content_bytes) if isinstance(content_bytes, bytes) else content_bytes
+            with rawpy.imread(source) as raw:
                 rgb = raw.postprocess()
                 return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
 
-        arr = np.asarray(bytearray(content_bytes), dtype=np.uint8)
+        if lower.endswith(('.jpg', '.jpeg')):
+            try:
+                img = decode_jpeg_scaled(content_bytes, max_dim)
+                if img is not None:
+                    return img
+            except Exception as e:
+                print(f"TurboJPEG decode failed for {file_name}, retrying with OpenCV: {e}")
+
+        # zero-copy view; works for bytes and mmap alike
+        arr = np.frombuffer(content_bytes, dtype=np.uint8)
         return cv2.imdecode(arr, cv2.IMREAD_COLOR)
     except Exception as e:
         print(f"decode error for {file_name}: {e}")
         return None
 
 # ---------------- Drive helpers ----------------
-def get_all_images_recursive(parent_id):
-    ensure_drive_service()
-    all_files = []
+def _thread_drive_service():
+    svc = getattr(_thread_local, "drive_service", None)
+    if svc is None:
+        svc = build("drive", "v3", credentials=drive_creds, cache_discovery=False)
+        _thread_local.drive_service = svc
+    return svc
+
+
+def _list_children(parent_ids):
+    """All non-trashed children of any of parent_ids, one composite query, all pages."""
+    service = _thread_drive_service()
+    q = "(" + " or ".join(f"'{p}' in parents" for p in parent_ids) + ") and trashed=false"
+    items = []
     page_token = None
     while True:
-        response = drive_service.files().list(
-            q=f"'{parent_id}' in parents and trashed=false",
-            fields="nextPageToken, files(id, name, mimeType, webViewLink)",
-            pageSize=500,
+        response = service.files().list(
+            q=q,
+            fields="nextPageToken, files(id, name, mimeType, webViewLink, modifiedTime)",
+            pageSize=1000,
             pageToken=page_token
         ).execute()
 
-        items = response.get('files', [])
-        for item in items:
-            if item['mimeType'] == 'application/vnd.google-apps.folder':
-                all_files.extend(get_all_images_recursive(item['id']))
-            elif item['mimeType'].startswith('image/'):
-                all_files.append(item)
+        items.extend(response.get('files', []))
 
         page_token = response.get('nextPageToken')
         if not page_token:
             break
 
-    return all_files
+    return items
 
-# ---------------- processing ----------------
-def process_file_upsert(file, owner_id, event_id):
-    file_id = file.get('id')
-    file_name = file.get('name', f"{file_id}.jpg")
 
-    try:
-        # -----------------------------
-        # 1) AUTHENTICATED DOWNLOAD
-        # -----------------------------
-        url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
-        fh = io.BytesIO()
+def get_all_images_recursive(parent_id):
+    """
+    Breadth-first listing of every image under parent_id. Each request
+    covers up to _DRIVE_PARENTS_PER_QUERY folders and independent requests
+    run concurrently, instead of one sequential round-trip per folder.
+    """
+    ensure_drive_service()
+    all_files = []
+    seen = {parent_id}
+    pending = deque([parent_id])
+    running = set()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_DRIVE_LIST_WORKERS) as executor:
+        while pending or running:
+            while pending:
+                batch = [pending.popleft() for _ in range(min(_DRIVE_PARENTS_PER_QUERY, len(pending)))]
+                running.add(executor.submit(_list_children, batch))
+
+            done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                for item in fut.result():
+                    if item['id'] in seen:
+                        continue
+                    seen.add(item['id'])
+                    if item['mimeType'] == 'application/vnd.google-apps.folder':
+                        pending.append(item['id'])
+                    elif item['mimeType'].startswith('image/'):
+                        all_files.append(item)
 
-        try:
-            # Try primary authenticated method: MediaIoBaseDownload
-            from googleapiclient.http import MediaIoBaseDownload
-            request = drive_service.files().get_media(fileId=file_id)
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
+    return all_files
 
-            fh.seek(0)
-            content_bytes = fh.getvalue()
+# ---------------- image preparation ----------------
+def letterbox_into(img, canvas):
+    """
+    Aspect-preserving resize straight into the top-left of a preallocated
+    square canvas, zero padding the rest (the layout SCRFD.detect builds).
+    Returns det_scale.
+    """
+    size = canvas.shape[0]
+    h, w = img.shape[:2]
+    # max(1, ...): panoramas/strips thinner than 1/640 of their length would round to 0
+    if h > w:
+        new_h, new_w = size, max(1, int(size * w / h))
+    else:
+        new_w, new_h = size, max(1, int(size * h / w))
+    cv2.resize(img, (new_w, new_h), dst=canvas[:new_h, :new_w])
+    canvas[new_h:] = 0
+    canvas[:new_h, new_w:] = 0
+    return float(new_h) / h
 
-        except Exception as e:
-            # Primary method failed — fallback to authenticated HTTP GET using SA token
-            print(f"Authenticated MediaIoBaseDownload failed for {file_name}: {e}")
-            try:
-                from google.auth.transport.requests import Request as GoogleRequest
-                global drive_creds
-                if drive_creds is None:
-                    raise RuntimeError("drive_creds not initialized")
-
-                # refresh service account token
-                drive_creds.refresh(GoogleRequest())
-                token = drive_creds.token
-                if not token:
-                    raise RuntimeError("Could not obtain access token for service account")
-
-                headers = {"Authorization": f"Bearer {token}"}
-                resp = requests.get(url, headers=headers, timeout=60)
-                resp.raise_for_status()
-                content_bytes = resp.content
-
-            except Exception as e2:
-                print(f"Authenticated fallback download also failed for {file_name}: {e2}")
-                raise
-
-        # -----------------------------
-        # 2) DECODE IMAGE
-        # -----------------------------
-        img = decode_image_from_bytes(content_bytes, file_name)
-        if img is None:
-            print(f"❌ Could not read image: {file_name}")
-            return 0
 
-        # Resize for speed
-        h, w = img.shape[:2]
-        if max(h, w) > MAX_DIM:
-            scale = MAX_DIM / max(h, w)
-            img = cv2.resize(img, (int(w * scale), int(h * scale)))
+def _decode_and_resize(content_bytes, file_name, max_dim):
+    """
+    Decode and downscale to max_dim. Returns the BGR image (what InsightFace
+    expects) or None. Top-level so it can be pickled into the decode
+    ProcessPoolExecutor.
+    """
+    img = decode_image_from_bytes(content_bytes, file_name, max_dim)
+    if img is None:
+        return None
 
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    # Resize for speed; images within 10% of max_dim aren't worth a full pass.
+    # INTER_AREA avoids aliasing on large downscales and is the faster path there.
+    h, w = img.shape[:2]
+    long_side = max(h, w)
+    if long_side > max_dim * 1.1:
+        scale = max_dim / long_side
+        interp = cv2.INTER_AREA if long_side > 2 * max_dim else cv2.INTER_LINEAR
+        img = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=interp)
 
-        # -----------------------------
-        # 3) FACE DETECTION
-        # -----------------------------
-        faces = app.get(img_rgb)
-        if not faces:
-            return 0
+    return img
 
-        # -----------------------------
-        # 4) ENSURE QDRANT COLLECTION EXISTS
-        # -----------------------------
-        first_dim = len(faces[0].normed_embedding)
-        ensure_collection(first_dim)
-
-        # -----------------------------
-        # 5) UPSERT FACES
-        # -----------------------------
-        points = []
-        for i, face in enumerate(faces):
-            emb = face.normed_embedding.astype(np.float32)
-            point_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{file_id}_{i}"))
-            payload = {
-                "owner_id": owner_id,
-                "event_id": event_id,
-                "file_id": file_id,
-                "file_name": file_name,
-                "link": file.get('webViewLink', ''),
-                "bbox": face.bbox.tolist() if hasattr(face, "bbox") else None
-            }
-            points.append({
-                "id": point_id,
-                "vector": emb.tolist(),
-                "payload": payload
-            })
+def _decode_local_file(path, file_name, max_dim):
+    """
+    _decode_and_resize for a local path: the decode process maps the file
+    instead of the parent reading it and pickling the bytes across. RAW files
+    go to LibRaw by path, which never holds a second copy of the file.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            print(f"decode error for {file_name}: empty file")
+            return None
+        if file_name.lower().endswith(_RAW_EXTS):
+            mm = None
+        else:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm is None:
+        return _decode_and_resize(path, file_name, max_dim)
+    try:
+        return _decode_and_resize(mm, file_name, max_dim)
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            pass  # a lingering numpy view; unmapped once it is collected
 
-        if points:
-            qdrant.upsert(collection_name=COLLECTION_NAME, points=points)
-            return len(points)
+# ---------------- loading ----------------
+def download_file_bytes(file):
+    """
+    Plain authenticated GET over the shared pooled session. Images are small,
+    so a single request beats MediaIoBaseDownload's chunk loop and per-file
+    TLS handshake.
+    """
+    file_id = file.get('id')
+    url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
+    resp = drive_session.get(url, timeout=60)
+    resp.raise_for_status()
+    return resp.content
 
-        return 0
 
+def fetch_file_job(file):
+    """Stage 1 for Drive files: download. Returns the decode job for the process pool, or None."""
+    file_id = file.get('id')
+    file_name = file.get('name', f"{file_id}.jpg")
+    try:
+        content_bytes = download_file_bytes(file)
     except Exception as e:
-        print(f"Error processing {file_name}: {e}")
-        return 0
+        print(f"Error downloading {file_name}: {e}")
+        return None
+    return _decode_and_resize, (content_bytes, file_name, MAX_DIM)
 
 # ---------------- local-folder helpers ----------------
 def get_images_from_local_folder(path):
-    exts = ('.jpg', '.jpeg', '.png', '.heic', '.heif', '.nef', '.cr2', '.arw', '.raf')
+    exts = ('.jpg', '.jpeg', '.png', '.heic', '.heif') + _RAW_EXTS
     files = []
     for p in Path(path).rglob('*'):
         if p.is_file() and p.suffix.lower() in exts:
@@ -359,60 +667,401 @@ def get_images_from_local_folder(path):
                 "id": str(p.absolute()),
                 "name": p.name,
                 "mimeType": "image/" + p.suffix.lstrip('.'),
-                "webViewLink": str(p.absolute())
+                "webViewLink": str(p.absolute()),
+                "modifiedTime": str(p.stat().st_mtime_ns)
             })
     return files
 
-def process_local_file_upsert(file, owner_id, event_id):
-    # file['id'] is path in local mode
-    try:
-        path = file['id']
-        with open(path, 'rb') as f:
-            content_bytes = f.read()
-        # reuse process logic by creating a minimal file dict and using decode_image
-        fake_file = {"id": path, "name": file['name'], "webViewLink": file['webViewLink']}
-        # reuse decode + embedding logic (we call decode_image_from_bytes then process like above)
-        img = decode_image_from_bytes(content_bytes, file['name'])
-        if img is None:
-            print(f"❌ Cannot decode local file {path}")
-            return 0
+def local_file_job(file):
+    # file['id'] is path in local mode; the decode process maps it itself
+    return _decode_local_file, (file['id'], file['name'], MAX_DIM)
 
-        # resize
-        h, w = img.shape[:2]
-        if max(h, w) > MAX_DIM:
-            scale = MAX_DIM / max(h, w)
-            img = cv2.resize(img, (int(w * scale), int(h * scale)))
+# ---------------- GPU inference ----------------
+def _decode_scrfd_outputs(det, net_outs, det_scale):
+    """
+    Post-process the SCRFD outputs of a single image (batch dim already removed).
+    Mirrors SCRFD.forward + SCRFD.detect (threshold, anchor decode, NMS).
+    """
+    from insightface.model_zoo.scrfd import distance2bbox, distance2kps
+
+    fmc = det.fmc
+    scores_list, bboxes_list, kpss_list = [], [], []
+    for idx, stride in enumerate(det._feat_stride_fpn):
+        height = width = _DET_SIZE // stride
+        key = (height, width, stride)
+        anchor_centers = det.center_cache.get(key)
+        if anchor_centers is None:
+            anchor_centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+            anchor_centers = (anchor_centers * stride).reshape((-1, 2))
+            if det._num_anchors > 1:
+                anchor_centers = np.stack([anchor_centers] * det._num_anchors, axis=1).reshape((-1, 2))
+            det.center_cache[key] = anchor_centers
+
+        scores = net_outs[idx]
+        pos_inds = np.where(scores >= det.det_thresh)[0]
+        centers = anchor_centers[pos_inds]
+        scores_list.append(scores[pos_inds])
+        bboxes_list.append(distance2bbox(centers, net_outs[idx + fmc][pos_inds] * stride))
+        if det.use_kps:
+            kpss = distance2kps(centers, net_outs[idx + fmc * 2][pos_inds] * stride)
+            kpss_list.append(kpss.reshape((kpss.shape[0], kpss.shape[1] // 2, 2)))  # may be empty
+
+    scores = np.vstack(scores_list)
+    order = scores.ravel().argsort()[::-1]
+    pre_det = np.hstack((np.vstack(bboxes_list) / det_scale, scores)).astype(np.float32, copy=False)
+    pre_det = pre_det[order, :]
+    keep = det.nms(pre_det)
+    kpss = None
+    if det.use_kps:
+        kpss = (np.vstack(kpss_list) / det_scale)[order][keep]
+    return pre_det[keep, :], kpss
+
+
+def detect_faces_batch(imgs, blob, canvas):
+    """
+    Run the detector over a batch of BGR images.
+    blob: preallocated (B,3,640,640) float32; canvas: reusable 640x640x3 uint8.
+    Returns a list of (dets, kpss) per image.
+    """
+    det = app.det_model
+    n = len(imgs)
+    det_scales = []
+    for b, img in enumerate(imgs):
+        det_scales.append(letterbox_into(img, canvas))
+        # same as cv2.dnn.blobFromImage(..., swapRB=True) but into the shared buffer
+        np.subtract(canvas[:, :, ::-1].transpose(2, 0, 1), det.input_mean, out=blob[b], dtype=np.float32)
+    blob[:n] *= 1.0 / det.input_std
+
+    # detectors exported without a batch dim (or with a fixed batch of 1) run image by image
+    if not det.batched or det.input_shape[0] == 1:
+        per_image = [det.session.run(det.output_names, {det.input_name: blob[b:b + 1]}) for b in range(n)]
+        if det.batched:
+            per_image = [[out[0] for out in outs] for outs in per_image]
+    else:
+        net_outs = det.session.run(det.output_names, {det.input_name: blob[:n]})
+        per_image = [[out[b] for out in net_outs] for b in range(n)]
+
+    return [_decode_scrfd_outputs(det, outs, det_scale)
+            for outs, det_scale in zip(per_image, det_scales)]
 
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        faces = app.get(img_rgb)
-        if not faces:
+
+def embed_faces(crops, blob):
+    """
+    Batched recognition over aligned BGR crops.
+    blob: preallocated (_REC_BATCH_SIZE, 3, H, W) float32 reused across calls.
+    Returns L2-normalized (N, dim) float32.
+    """
+    rec = app.models["recognition"]
+    feats = []
+    for start in range(0, len(crops), _REC_BATCH_SIZE):
+        chunk = crops[start:start + _REC_BATCH_SIZE]
+        for k, crop in enumerate(chunk):
+            # same as cv2.dnn.blobFromImages(..., swapRB=True) in ArcFaceONNX.get_feat
+            np.subtract(crop[:, :, ::-1].transpose(2, 0, 1), rec.input_mean, out=blob[k], dtype=np.float32)
+        n = len(chunk)
+        blob[:n] *= 1.0 / rec.input_std
+        feats.append(rec.session.run(rec.output_names, {rec.input_name: blob[:n]})[0])
+    embs = np.vstack(feats).astype(np.float32, copy=False)
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    return embs
+
+
+def flush_points(wait=False):
+    """
+    Send everything buffered in one upsert, then record the files those points
+    came from in the manifest. Returns the number of points sent.
+    """
+    global _last_flush
+    with _point_lock:
+        points = list(_point_buffer)
+        _point_buffer.clear()
+        rows = _manifest_rows[:]
+        _manifest_rows.clear()
+        _last_flush = time.monotonic()
+    if points:
+        try:
+            qdrant.upsert(collection_name=COLLECTION_NAME, points=points, wait=wait)
+        except Exception as e:
+            # rows dropped with their points: these files are retried next run
+            print(f"Upsert of {len(points)} points failed: {e}")
             return 0
+    write_manifest(rows)
+    return len(points)
 
-        first_dim = len(faces[0].normed_embedding)
-        ensure_collection(first_dim)
-
-        points = []
-        for i, face in enumerate(faces):
-            emb = face.normed_embedding.astype(np.float32)
-            point_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{path}_{i}"))
-            payload = {
-                "owner_id": owner_id,
-                "event_id": event_id,
-                "file_id": path,
-                "file_name": file['name'],
-                "link": file['webViewLink'],
-                "bbox": face.bbox.tolist() if hasattr(face, "bbox") else None
-            }
-            points.append({"id": point_id, "vector": emb.tolist(), "payload": payload})
-
-        if points:
-            qdrant.upsert(collection_name=COLLECTION_NAME, points=points)
-            return len(points)
-        return 0
 
-    except Exception as e:
-        print("Error processing local file", file.get('name'), e)
-        return 0
+def point_id(key):
+    """Deterministic UUID for a face key; BLAKE2b is cheaper than uuid5's SHA-1."""
+    return str(uuid.UUID(bytes=hashlib.blake2b(key.encode(), digest_size=16).digest()))
+
+
+def upsert_faces(file, owner_id, event_id, dets, embs):
+    """
+    Queue one point per face. Points from many files are sent together every
+    _UPSERT_BATCH points or _UPSERT_INTERVAL seconds; returns how many points
+    this call flushed (call flush_points(wait=True) at the end of a run).
+    The file's manifest row is queued with its points.
+    """
+    file_id = file.get('id')
+    file_name = file.get('name', f"{file_id}.jpg")
+
+    # ensure qdrant collection exists
+    ensure_collection(embs.shape[1])
+
+    # bbox as 4 little-endian int16 pixel coords (x1, y1, x2, y2), hex encoded:
+    # 16 chars instead of ~80 chars of JSON floats
+    bbox_raw = np.rint(dets[:, 0:4]).astype("<i2").tobytes()
+
+    # one C-level conversion per array instead of one per face
+    vectors = embs.tolist()
+    base = {
+        "owner_id": owner_id,
+        "event_id": event_id,
+        "file_id": file_id,
+        "file_name": file_name,
+        "link": file.get('webViewLink', ''),
+    }
+    payloads = [{**base, "bbox": bbox_raw[i * 8:(i + 1) * 8].hex()} for i in range(len(vectors))]
+    if _SIGN_BITS:
+        # sign bits of each embedding (64 bytes for 512-d, 88 base64 chars) for
+        # Hamming/popcount scans outside Qdrant
+        bins = np.packbits(embs > 0, axis=1)
+        for payload, bits in zip(payloads, bins):
+            payload["bin"] = base64.b64encode(bits.tobytes()).decode("ascii")
+    points = [
+        PointStruct(id=point_id(f"{file_id}_{i}"), vector=vectors[i], payload=payloads[i])
+        for i in range(len(vectors))
+    ]
+
+    row = _manifest_row(file, owner_id, event_id, len(points))
+    with _point_lock:
+        _point_buffer.extend(points)
+        if row is not None:
+            _manifest_rows.append(row)
+        due = (len(_point_buffer) >= _UPSERT_BATCH
+               or time.monotonic() - _last_flush >= _UPSERT_INTERVAL)
+    return flush_points() if due else 0
+
+
+def lookup_duplicate(img):
+    """
+    Burst shots and re-uploads are near-identical: look the frame up by the
+    hash of its 32x32 thumbnail, then against the last few frames by mean
+    abs diff. Returns (key, thumb, (dets, embs) or None).
+    """
+    thumb = cv2.resize(img, (32, 32), interpolation=cv2.INTER_AREA).astype(np.int16)
+    shape = img.shape[:2]
+    key = (shape, hashlib.blake2b(thumb.tobytes(), digest_size=8).digest())
+    if _DUP_THRESHOLD <= 0:
+        return key, thumb, None
+
+    with _dup_lock:
+        hit = _dup_cache.get(key)
+        if hit is not None:
+            _dup_cache.move_to_end(key)
+            return key, thumb, hit
+        # bboxes are in pixel coordinates, so only frames of the same size can share them
+        for prev_shape, prev_thumb, prev_key in reversed(_dup_recent):
+            if prev_shape == shape and np.mean(np.abs(thumb - prev_thumb)) < _DUP_THRESHOLD:
+                hit = _dup_cache.get(prev_key)
+                if hit is not None:
+                    return key, thumb, hit
+    return key, thumb, None
+
+
+def remember_faces(key, thumb, shape, faces):
+    if _DUP_THRESHOLD <= 0:
+        return
+    with _dup_lock:
+        _dup_cache[key] = faces
+        _dup_cache.move_to_end(key)
+        if len(_dup_cache) > _DUP_CACHE_SIZE:
+            _dup_cache.popitem(last=False)
+        _dup_recent.append((shape, thumb, key))
+
+
+def _take_batch(q, limit, weight=lambda item: 1):
+    """
+    Block for one item, then take whatever else is already queued until the
+    summed weight reaches limit. Returns (items, done); None ends the stream.
+    """
+    items, total = [], 0
+    item = q.get()
+    while True:
+        if item is None:
+            return items, True
+        items.append(item)
+        total += weight(item)
+        if total >= limit:
+            return items, False
+        try:
+            item = q.get_nowait()
+        except queue.Empty:
+            return items, False
+
+
+def detect_batch(batch, blob, canvas):
+    """
+    Duplicate lookup + batched detection + face alignment for (file, img)
+    items. Returns one record per file for the recognition stage; duplicate
+    hits already carry their embeddings.
+    """
+    from insightface.utils import face_align
+
+    image_size = app.models["recognition"].input_size[0]
+    records, misses = [], []
+    for file, img in batch:
+        key, thumb, hit = lookup_duplicate(img)
+        record = {"file": file, "key": key, "thumb": thumb, "shape": img.shape[:2],
+                  "dets": None, "crops": (), "embs": None}
+        if hit is None:
+            misses.append((record, img))
+        else:
+            record["dets"], record["embs"] = hit
+        records.append(record)
+
+    if misses:
+        detections = detect_faces_batch([img for _, img in misses], blob, canvas)
+        for (record, img), (dets, kpss) in zip(misses, detections):
+            record["dets"] = dets
+            if kpss is not None:
+                record["crops"] = [face_align.norm_crop(img, landmark=kps, image_size=image_size) for kps in kpss]
+    return records
+
+
+def _drain(q):
+    """Discard items up to the end-of-stream None so the stage feeding q never blocks on it."""
+    while q.get() is not None:
+        pass
+
+
+def decode_loop(fetch_q, work_q):
+    """
+    Stage 2: hand decode jobs to the process pool, keeping at most two per
+    process in flight, and forward decoded images in completion order.
+    put() on the bounded work_q blocks when the GPU falls behind.
+    """
+    in_flight = {}
+    reading = True
+    try:
+        while reading or in_flight:
+            while reading and len(in_flight) < _DECODE_WORKERS * 2:
+                try:
+                    item = fetch_q.get(block=not in_flight)
+                except queue.Empty:
+                    break
+                if item is None:
+                    reading = False
+                    break
+                file, job = item
+                if job is None:  # download failed
+                    work_q.put((file, None))
+                    continue
+                fn, args = job
+                try:
+                    in_flight[decode_pool.submit(fn, *args)] = file
+                except BrokenProcessPool as e:
+                    print(f"Error decoding {file.get('name')}: {e}")
+                    work_q.put((file, None))
+                    ensure_decode_pool()
+
+            if not in_flight:
+                continue
+            done, _ = concurrent.futures.wait(in_flight, timeout=0.05, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                file = in_flight.pop(fut)
+                try:
+                    img = fut.result()
+                except BrokenProcessPool as e:
+                    # a worker died; everything in flight fails with it
+                    print(f"Error decoding {file.get('name')}: {e}")
+                    img = None
+                    ensure_decode_pool()
+                except Exception as e:
+                    print(f"Error decoding {file.get('name')}: {e}")
+                    img = None
+                if img is None:
+                    print(f"❌ Could not read image: {file.get('name')}")
+                work_q.put((file, img))
+    finally:
+        if reading:
+            _drain(fetch_q)
+        work_q.put(None)
+
+
+def detection_loop(work_q, crop_q, pbar):
+    """
+    GPU stage 1: detect + align. Detector runs on up to _BATCH_SIZE images
+    at a time; the aligned 112x112 crops go to the recognition stage.
+    """
+    blob = np.empty((_BATCH_SIZE, 3, _DET_SIZE, _DET_SIZE), np.float32)
+    canvas = np.empty((_DET_SIZE, _DET_SIZE, 3), np.uint8)
+    done = False
+    try:
+        while not done:
+            items, done = _take_batch(work_q, _BATCH_SIZE)
+            batch = [item for item in items if item[1] is not None]
+            pbar.update(len(items) - len(batch))  # undecodable files
+            if not batch:
+                continue
+            try:
+                records = detect_batch(batch, blob, canvas)
+            except Exception as e:
+                # retry image by image so one bad file doesn't drop the whole batch
+                print("Detection exception:", e)
+                records = []
+                for item in batch:
+                    try:
+                        records.extend(detect_batch([item], blob, canvas))
+                    except Exception as e:
+                        print(f"Detection exception for {item[0].get('name')}: {e}")
+                        pbar.update(1)
+            for record in records:
+                crop_q.put(record)
+    finally:
+        if not done:
+            _drain(work_q)
+        crop_q.put(None)
+
+
+def recognition_loop(crop_q, owner_id, event_id, pbar, result):
+    """
+    GPU stage 2: the 100-layer recognizer is the expensive model, so crops
+    from many images are pooled into batches of _REC_BATCH_SIZE before each
+    session.run, then normalized and upserted.
+    """
+    rec = app.models["recognition"]
+    blob = np.empty((_REC_BATCH_SIZE, 3, rec.input_size[1], rec.input_size[0]), np.float32)
+    done = False
+    try:
+        while not done:
+            records, done = _take_batch(crop_q, _REC_BATCH_SIZE, weight=lambda r: len(r["crops"]) or 1)
+            if not records:
+                continue
+            try:
+                pending = [r for r in records if r["embs"] is None]
+                crops = [crop for r in pending for crop in r["crops"]]
+                embs = embed_faces(crops, blob) if crops else np.empty((0, 0), np.float32)
+                offset = 0
+                for r in pending:
+                    n = len(r["crops"])
+                    r["embs"] = embs[offset:offset + n]
+                    offset += n
+                    remember_faces(r["key"], r["thumb"], r["shape"], (r["dets"], r["embs"]))
+
+                for r in records:
+                    if len(r["embs"]) == 0:
+                        record_indexed(r["file"], owner_id, event_id, 0)
+                        continue
+                    try:
+                        result["upserted"] += upsert_faces(r["file"], owner_id, event_id, r["dets"], r["embs"])
+                    except Exception as e:
+                        print(f"Error upserting {r['file'].get('name')}: {e}")
+            except Exception as e:
+                print("Recognition exception:", e)
+            pbar.update(len(records))
+    finally:
+        if not done:
+            _drain(crop_q)
 
 # ---------------- main run ----------------
 def run_indexing(owner_id, folder_id, event_name, local_folder=None):
@@ -420,6 +1069,8 @@ def run_indexing(owner_id, folder_id, event_name, local_folder=None):
     # init services
     ensure_insightface()
     ensure_qdrant_client()
+    ensure_decode_pool()
+    ensure_manifest_db()
 
     start_time = time.time()
 
@@ -429,19 +1080,50 @@ def run_indexing(owner_id, folder_id, event_name, local_folder=None):
         ensure_drive_service()
         files = get_all_images_recursive(folder_id)
 
-    print(f"Found {len(files)} images to process")
+    found = len(files)
+    files = filter_unchanged(files, owner_id, event_name)
+    print(f"Found {found} images, {len(files)} new or changed to process")
+
+    job_fn = local_file_job if local_folder else fetch_file_job
+
+    # download threads -> fetch_q -> decode processes -> work_q -> detection
+    # thread -> crop_q -> recognition thread. Every queue is bounded so a fast
+    # stage blocks instead of piling images up in memory.
+    fetch_q = queue.Queue(maxsize=_QUEUE_SIZE)
+    work_q = queue.Queue(maxsize=_QUEUE_SIZE)
+    crop_q = queue.Queue(maxsize=_QUEUE_SIZE)
+    result = {"upserted": 0}
+    pbar = tqdm(total=len(files))
+    stages = [
+        threading.Thread(target=decode_loop, args=(fetch_q, work_q), daemon=True),
+        threading.Thread(target=detection_loop, args=(work_q, crop_q, pbar), daemon=True),
+        threading.Thread(target=recognition_loop, args=(crop_q, owner_id, event_name, pbar, result), daemon=True),
+    ]
+    for t in stages:
+        t.start()
+
+    def show_depths():
+        pbar.set_postfix(fetched=fetch_q.qsize(), decoded=work_q.qsize(), crops=crop_q.qsize(), refresh=False)
 
-    total_upserted = 0
-    worker_fn = process_local_file_upsert if local_folder else process_file_upsert
+    def _fetch_and_enqueue(f):
+        fetch_q.put((f, job_fn(f)))
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
-        futures = [executor.submit(worker_fn, f, owner_id, event_name) for f in files]
-        for fut in tqdm(concurrent.futures.as_completed(futures), total=len(futures)):
+        futures = [executor.submit(_fetch_and_enqueue, f) for f in files]
+        for fut in concurrent.futures.as_completed(futures):
             try:
-                upserted = fut.result()
-                total_upserted += upserted
+                fut.result()
             except Exception as e:
                 print("Worker exception:", e)
+            show_depths()
+
+    fetch_q.put(None)
+    for t in stages:
+        while t.is_alive():
+            t.join(timeout=1.0)
+            show_depths()
+    pbar.close()
+    total_upserted = result["upserted"] + flush_points(wait=True)
 
     duration_min = (time.time() - start_time) / 60.0
     print(f"Indexing complete. Points upserted: {total_upserted}. Time: {duration_min:.2f} minutes.")
@@ -450,6 +1132,7 @@ def run_indexing(owner_id, folder_id, event_name, local_folder=None):
         "owner_id": owner_id,
         "event_id": event_name,
         "files_indexed": len(files),
+        "files_skipped": found - len(files),
         "points_upserted": total_upserted,
         "timestamp": time.time()
     }
@@ -460,7 +1143,8 @@ def run_indexing(owner_id, folder_id, event_name, local_folder=None):
     return manifest_path
 
 if __name__ == "__main__":
-    os.system("cat /app/indexer.py | sed -n '1,200p'")
+    if os.getenv("PIXELTRACE_DEBUG"):
+        os.system("cat /app/indexer.py | sed -n '1,200p'")
     parser = argparse.ArgumentParser()
     parser.add_argument("--folder-id", dest="folder_id", default=os.getenv("DRIVE_FOLDER_ID"))
     parser.add_argument("--event-name", dest="event_name", default=os.getenv("EVENT_NAME", "event"))
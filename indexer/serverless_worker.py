@@ -1,7 +1,80 @@
 import runpod
 import os
-import subprocess
+import sys
+import io
 import json
+import threading
+import contextlib
+from collections import deque
+
+# indexer globals (FaceAnalysis/ORT sessions, qdrant client, Drive service,
+# decode pool) are created once per container and reused by every request
+import indexer
+
+
+class _TailWriter(io.TextIOBase):
+    """
+    Text stream that forwards to the real stream and keeps the last lines for
+    the response. Installed as both stdout and stderr (like the subprocess's
+    stderr=STDOUT) and written from the pipeline threads concurrently.
+    """
+
+    def __init__(self, stream, maxlen=60):
+        super().__init__()
+        self.stream = stream
+        self.lines = deque(maxlen=maxlen)
+        self._partial = {}  # thread id -> unfinished line; print() writes text and "\n" separately
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        return self.stream.encoding
+
+    @property
+    def errors(self):
+        return self.stream.errors
+
+    def isatty(self):
+        return self.stream.isatty()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        with self._lock:
+            self.stream.write(s)
+            # tqdm redraws with \r, treat it as a line break like text mode did
+            tid = threading.get_ident()
+            parts = (self._partial.pop(tid, "") + s).replace("\r", "\n").split("\n")
+            last = parts.pop()
+            if last:
+                self._partial[tid] = last
+            self.lines.extend(p.strip() for p in parts if p.strip())
+        return len(s)
+
+    def flush(self):
+        self.stream.flush()
+
+    def tail(self):
+        with self._lock:
+            lines = list(self.lines)
+            lines.extend(p.strip() for p in self._partial.values() if p.strip())
+        return lines[-self.lines.maxlen:]
+
+
+def warm_up():
+    """Load models and clients before the first request instead of inside it."""
+    try:
+        indexer.ensure_insightface()
+        indexer.ensure_qdrant_client()
+        indexer.ensure_decode_pool()
+    except (Exception, SystemExit) as e:
+        # run_indexing retries these and reports the error per request
+        print(f"WARNING: warm-up failed: {e}")
+
 
 def handler(event):
     try:
@@ -28,48 +101,33 @@ def handler(event):
         else:
             print("WARNING: No GCP_SERVICE_ACCOUNT found")
 
-        # Build environment dictionary explicitly
-        env = os.environ.copy()
-
-        # Override with our specific values
-        env["DRIVE_FOLDER_ID"] = drive_folder
-        env["OWNER_ID"] = owner_id
-        env["EVENT_NAME"] = event_name
-        env["SERVICE_ACCOUNT_FILE"] = service_account_path
-
-        print("Starting subprocess...")
-        print(f"DEBUG: Env has DRIVE_FOLDER_ID={env.get('DRIVE_FOLDER_ID')}")
-        print(f"DEBUG: Env has OWNER_ID={env.get('OWNER_ID')}")
-        print(f"DEBUG: Env has EVENT_NAME={env.get('EVENT_NAME')}")
-
-        process = subprocess.Popen(
-            ["/bin/bash", "/app/entrypoint.sh"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            env=env
-        )
-
-        logs = []
-        for line in process.stdout:
-            print(f"[subprocess] {line.strip()}")
-            logs.append(line.strip())
-        process.wait()
+        # only read when the Drive service is first built
+        indexer.SERVICE_ACCOUNT_FILE = service_account_path
 
-        print(f"Subprocess finished with exit code: {process.returncode}")
+        tail = _TailWriter(sys.stdout)
+        exit_code = 0
+        manifest_path = None
+        with contextlib.redirect_stdout(tail), contextlib.redirect_stderr(tail):
+            try:
+                manifest_path = indexer.run_indexing(owner_id=owner_id, folder_id=drive_folder, event_name=event_name)
+                print("Wrote manifest:", manifest_path)
+            except (Exception, SystemExit) as e:
+                import traceback
+                print("Fatal error:", e)
+                traceback.print_exc(file=sys.stdout)
+                exit_code = 1
 
-        manifest_path = f"/app/index_manifest_{owner_id}_{event_name}.json"
-        manifest = None
+        print(f"Indexing finished with exit code: {exit_code}")
 
-        if os.path.exists(manifest_path):
+        if manifest_path and os.path.exists(manifest_path):
             with open(manifest_path, "r") as f:
                 manifest = json.load(f)
         else:
             manifest = {"status": "manifest not found"}
 
         return {
-            "exit_code": process.returncode,
-            "logs": logs[-60:],
+            "exit_code": exit_code,
+            "logs": tail.tail(),
             "manifest": manifest
         }
     except Exception as e:
@@ -82,4 +140,7 @@ def handler(event):
             "manifest": {"error": str(e)}
         }
 
-runpod.serverless.start({"handler": handler})
+# guarded: the spawn-based decode pool re-imports this file in its workers
+if __name__ == "__main__":
+    warm_up()
+    runpod.serverless.start({"handler": handler})
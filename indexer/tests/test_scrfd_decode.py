@@ -0,0 +1,92 @@
+"""
+detect_faces_batch/_decode_scrfd_outputs must give what SCRFD.detect gives,
+including when some (or all) strides have no anchor above det_thresh.
+
+Run from indexer/: pip install -r requirements-dev.txt && python -m pytest tests
+The real-detector check needs the antelopev2 weights; point SCRFD_MODEL at
+scrfd_10g_bnkps.onnx when they aren't where ensure_insightface puts them.
+"""
+
+import os
+import sys
+import types
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+insightface = pytest.importorskip("insightface")
+from insightface.model_zoo.scrfd import SCRFD
+
+import indexer
+
+FIXTURE = Path(insightface.__file__).resolve().parent / "data" / "images" / "t1.jpg"
+DETECTOR = Path(os.getenv("SCRFD_MODEL", "/app/.insightface/models/antelopev2/scrfd_10g_bnkps.onnx"))
+
+
+class _StrideSession:
+    """
+    Stands in for the SCRFD ONNX session: scores follow the input brightness
+    per anchor, except on the strides listed in empty, which score 0.
+    """
+
+    def __init__(self, empty):
+        self.empty = empty
+
+    def get_inputs(self):
+        return [types.SimpleNamespace(name="input.1", shape=[1, 3, 640, 640])]
+
+    def get_outputs(self):
+        return [types.SimpleNamespace(name=f"out{i}", shape=[None, 1]) for i in range(9)]
+
+    def run(self, names, feeds):
+        blob = feeds["input.1"][0]
+        scores, bboxes, kpss = [], [], []
+        for stride in (8, 16, 32):
+            size = blob.shape[1] // stride
+            pooled = cv2.resize(blob.mean(0), (size, size), interpolation=cv2.INTER_AREA)
+            s = np.repeat(1 / (1 + np.exp(-4 * pooled.reshape(-1, 1))), 2, axis=0)
+            if stride in self.empty:
+                s[:] = 0
+            scores.append(s.astype(np.float32))
+            bboxes.append(np.repeat(np.abs(pooled.reshape(-1, 1)) + 1, 2, axis=0) * np.ones((1, 4), np.float32))
+            kpss.append(np.tile(np.linspace(-1, 1, 10, dtype=np.float32), (s.shape[0], 1)))
+        return scores + bboxes + kpss
+
+
+def _fixture_image():
+    img = cv2.imread(str(FIXTURE))
+    if img is None:
+        pytest.skip(f"fixture image not found at {FIXTURE}")
+    return img
+
+
+def _assert_matches_detect(monkeypatch, det, imgs):
+    monkeypatch.setattr(indexer, "app", types.SimpleNamespace(det_model=det))
+    blob = np.empty((len(imgs), 3, indexer._DET_SIZE, indexer._DET_SIZE), np.float32)
+    canvas = np.empty((indexer._DET_SIZE, indexer._DET_SIZE, 3), np.uint8)
+    got = indexer.detect_faces_batch(imgs, blob, canvas)
+    for img, (dets, kpss) in zip(imgs, got):
+        ref_dets, ref_kpss = det.detect(img, input_size=(indexer._DET_SIZE, indexer._DET_SIZE))
+        assert dets.shape == ref_dets.shape
+        np.testing.assert_allclose(dets, ref_dets, atol=1e-3)
+        np.testing.assert_allclose(kpss, ref_kpss, atol=1e-3)
+
+
+@pytest.mark.parametrize("empty", [(8,), (8, 32), (8, 16, 32)])
+def test_empty_strides_match_scrfd_detect(monkeypatch, empty):
+    det = SCRFD(session=_StrideSession(empty))
+    _assert_matches_detect(monkeypatch, det, [_fixture_image()])
+
+
+def test_antelope_detector_matches_scrfd_detect(monkeypatch):
+    if not DETECTOR.exists():
+        pytest.skip(f"detector weights not found at {DETECTOR} (set SCRFD_MODEL)")
+    det = SCRFD(model_file=str(DETECTOR))
+    det.prepare(-1, det_thresh=0.5)
+    img = _fixture_image()
+    # a blank frame has no anchor above det_thresh on any stride
+    _assert_matches_detect(monkeypatch, det, [img, np.zeros_like(img)])